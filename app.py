@@ -4,6 +4,8 @@ from datetime import datetime
 
 from flask import Flask, render_template, request
 
+import historico
+import texto_analise
 from main import (
     obter_dados_tecnicos,
     obter_dados_fundamentalistas,
@@ -92,6 +94,14 @@ def montar_metricas_fundamentos(fundamentos):
     return metricas
 
 
+def registrar_historico(ticker, dados, fundamentos, analise, valor, metricas):
+    # Falha no histórico não pode derrubar o relatório
+    try:
+        historico.salvar_analise(ticker, dados, fundamentos, analise, valor, metricas=metricas)
+    except Exception as e:
+        app.logger.warning("Falha ao gravar histórico de %s: %s", ticker, e)
+
+
 @app.route("/", methods=["GET", "POST"])
 def index():
     erro = None
@@ -100,6 +110,7 @@ def index():
     if request.method == "POST":
         ticker = (request.form.get("ticker") or "").strip().upper()
         valor_raw = (request.form.get("valor") or "").strip().replace(",", ".")
+        profunda = request.form.get("profunda") == "on"
 
         if not ticker:
             erro = "Ticker inválido. Exemplo: AAPL, MSFT, NVDA."
@@ -118,7 +129,8 @@ def index():
                 erro = "Não foi possível obter dados de preço para esse ticker."
             else:
                 fundamentos = obter_dados_fundamentalistas(ticker)
-                analise = gerar_analise_ai(ticker, dados, fundamentos, valor)
+                analise, metricas = gerar_analise_ai(ticker, dados, fundamentos, valor, profunda)
+                registrar_historico(ticker, dados, fundamentos, analise, valor, metricas)
 
                 rsi = dados.get("rsi", 50)
                 rsi_status, rsi_class = classificar_rsi(rsi)
@@ -150,12 +162,36 @@ def index():
                     "acaoes": acoes,
                     "valor": valor,
                     "analise": analise,
+                    "analise_html": texto_analise.renderizar(analise)[1],
                     "metricas": montar_metricas_fundamentos(fundamentos),
                 }
 
     return render_template("index.html", erro=erro, resultado=resultado)
 
 
+@app.route("/historico")
+def ver_historico():
+    ticker = (request.args.get("ticker") or "").strip().upper()
+    score_min = safe_float(request.args.get("score_min"), 70)
+
+    serie = []
+    for ponto in historico.historico_indicadores(ticker) if ticker else []:
+        rsi = ponto["rsi"] if ponto["rsi"] is not None else 50
+        ponto["rsi_class"] = classificar_rsi(rsi)[1]
+        serie.append(ponto)
+
+    return render_template(
+        "historico.html",
+        ultimas=historico.ultimas_analises(),
+        ticker=ticker,
+        ultima=historico.ultima_analise(ticker, com_texto=True) if ticker else None,
+        serie=serie,
+        score_min=score_min,
+        destaques=historico.tickers_com_score_acima(score_min),
+        modelos=historico.comparar_modelos(),
+    )
+
+
 if __name__ == "__main__":
     port = int(os.getenv("PORT", "5000"))
     app.run(host="0.0.0.0", port=port, debug=True)
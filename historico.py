@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+HISTÓRICO DE ANÁLISES (SQLITE)
+Guarda cada execução (cotação, indicadores, fundamentos e texto do Claude)
+para consultar resultados anteriores sem novas chamadas aos provedores.
+"""
+
+import os
+import json
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+
+import texto_analise
+
+# ================= CONFIGURAÇÃO =================
+HISTORICO_DB = os.getenv(
+    "HISTORICO_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "historico.db"),
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analises (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ticker TEXT NOT NULL,
+    criado_em TEXT NOT NULL,
+    preco REAL,
+    variacao REAL,
+    rsi REAL,
+    sma_20 REAL,
+    sma_50 REAL,
+    score_fundamental INTEGER,
+    avaliacao TEXT,
+    valor REAL,
+    dados_json TEXT NOT NULL,
+    fundamentos_json TEXT NOT NULL,
+    analise TEXT,
+    analise_texto TEXT,
+    analise_html TEXT,
+    modelo TEXT,
+    duracao REAL,
+    custo REAL,
+    tokens_entrada INTEGER,
+    tokens_saida INTEGER,
+    truncada INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_analises_ticker_data ON analises (ticker, criado_em);
+CREATE INDEX IF NOT EXISTS idx_analises_data_score ON analises (criado_em, score_fundamental);
+"""
+
+# Colunas acrescentadas depois da primeira versão do banco
+_COLUNAS_NOVAS = {
+    "analise_texto": "TEXT",
+    "analise_html": "TEXT",
+    "modelo": "TEXT",
+    "duracao": "REAL",
+    "custo": "REAL",
+    "tokens_entrada": "INTEGER",
+    "tokens_saida": "INTEGER",
+    "truncada": "INTEGER",
+}
+
+# Definição única de "mais recente": horário do snapshot e, no empate, ordem
+# de gravação. Lotes gravam com o horário da coleta, que pode ser anterior
+# ao de execuções gravadas depois.
+_ORDEM_RECENTE = "ORDER BY criado_em DESC, id DESC"
+
+_inicializado = set()
+
+
+# ================= FUNÇÕES AUXILIARES =================
+def _num(v):
+    """Converte para float puro (numpy/pandas → float); None se inválido."""
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return None
+
+
+def _conectar(caminho=None):
+    caminho = caminho or HISTORICO_DB
+    conn = sqlite3.connect(caminho, timeout=10)
+    conn.row_factory = sqlite3.Row
+    if caminho not in _inicializado:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        existentes = {r["name"] for r in conn.execute("PRAGMA table_info(analises)")}
+        for coluna, tipo in _COLUNAS_NOVAS.items():
+            if coluna not in existentes:
+                conn.execute(f"ALTER TABLE analises ADD COLUMN {coluna} {tipo}")
+        _inicializado.add(caminho)
+    return conn
+
+
+def _linha_para_dict(row):
+    item = dict(row)
+    item["dados"] = json.loads(item.pop("dados_json"))
+    item["fundamentos"] = json.loads(item.pop("fundamentos_json"))
+    if item["analise"] and item["analise_html"] is None:
+        # Linhas gravadas antes das colunas renderizadas
+        item["analise_texto"], item["analise_html"] = texto_analise.renderizar(item["analise"])
+    return item
+
+
+# ================= GRAVAÇÃO =================
+def salvar_analise(ticker, dados, fundamentos, analise, valor=None, criado_em=None, caminho=None,
+                   metricas=None):
+    """Acrescenta uma execução ao histórico e retorna o id gerado.
+
+    O texto puro e o HTML da análise são gerados aqui, uma vez, e guardados
+    junto da linha para serem servidos sem novo processamento. `metricas`
+    (de gerar_analise_ai) guarda modelo, duração, tokens e custo da chamada.
+    """
+    criado_em = criado_em or datetime.now()
+    metricas = metricas or {}
+    analise_texto, analise_html = texto_analise.renderizar(analise)
+    fundamentos = fundamentos or {}
+    # cor_avaliacao é um código ANSI do terminal, não faz sentido persistir
+    fundamentos_limpos = {k: v for k, v in fundamentos.items() if k != "cor_avaliacao"}
+
+    with closing(_conectar(caminho)) as conn, conn:
+        cur = conn.execute(
+            """
+            INSERT INTO analises (
+                ticker, criado_em, preco, variacao, rsi, sma_20, sma_50,
+                score_fundamental, avaliacao, valor, dados_json, fundamentos_json, analise,
+                analise_texto, analise_html,
+                modelo, duracao, custo, tokens_entrada, tokens_saida, truncada
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                ticker.upper(),
+                criado_em.isoformat(timespec="seconds"),
+                _num(dados.get("preco")),
+                _num(dados.get("variacao")),
+                _num(dados.get("rsi")),
+                _num(dados.get("sma_20")),
+                _num(dados.get("sma_50")),
+                fundamentos.get("score_fundamental"),
+                fundamentos.get("avaliacao"),
+                _num(valor),
+                json.dumps(dados, default=str),
+                json.dumps(fundamentos_limpos, default=str),
+                analise,
+                analise_texto,
+                analise_html,
+                metricas.get("modelo"),
+                _num(metricas.get("duracao")),
+                _num(metricas.get("custo")),
+                metricas.get("tokens_entrada"),
+                metricas.get("tokens_saida"),
+                int(metricas["truncada"]) if "truncada" in metricas else None,
+            ),
+        )
+        return cur.lastrowid
+
+
+# ================= CONSULTAS =================
+def ultima_analise(ticker, caminho=None, com_texto=False):
+    """Execução mais recente de um ticker (ou None).
+
+    `com_texto=True` ignora execuções sem análise (Claude indisponível ou
+    item de lote com erro), para não esconder a última análise válida.
+    """
+    filtro = " AND analise IS NOT NULL" if com_texto else ""
+    with closing(_conectar(caminho)) as conn:
+        row = conn.execute(
+            f"SELECT * FROM analises WHERE ticker = ?{filtro} {_ORDEM_RECENTE} LIMIT 1",
+            (ticker.upper(),),
+        ).fetchone()
+    return _linha_para_dict(row) if row else None
+
+
+def ultimas_analises(caminho=None):
+    """Execução mais recente de cada ticker, ordenada da mais nova para a mais antiga."""
+    with closing(_conectar(caminho)) as conn:
+        rows = conn.execute(
+            """
+            SELECT * FROM analises WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, ROW_NUMBER() OVER (PARTITION BY ticker {ordem}) AS n
+                    FROM analises
+                ) WHERE n = 1
+            )
+            {ordem}
+            """.format(ordem=_ORDEM_RECENTE)
+        ).fetchall()
+    return [_linha_para_dict(r) for r in rows]
+
+
+def historico_indicadores(ticker, limite=100, caminho=None):
+    """Série de RSI/score/preço de um ticker, do mais antigo para o mais novo."""
+    with closing(_conectar(caminho)) as conn:
+        rows = conn.execute(
+            """
+            SELECT criado_em, preco, variacao, rsi, sma_20, sma_50, score_fundamental
+            FROM analises WHERE ticker = ?
+            {ordem} LIMIT ?
+            """.format(ordem=_ORDEM_RECENTE),
+            (ticker.upper(), limite),
+        ).fetchall()
+    return [dict(r) for r in reversed(rows)]
+
+
+def tickers_com_score_acima(score_minimo, dia=None, caminho=None):
+    """Tickers cuja análise mais recente do dia tem score acima de `score_minimo`."""
+    dia = dia or datetime.now().date()
+    inicio = dia.isoformat()
+    fim = inicio + "T99"  # limite superior lexicográfico do mesmo dia
+    with closing(_conectar(caminho)) as conn:
+        rows = conn.execute(
+            """
+            SELECT ticker, criado_em, score_fundamental, rsi, preco
+            FROM analises WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, ROW_NUMBER() OVER (PARTITION BY ticker {ordem}) AS n
+                    FROM analises
+                    WHERE criado_em >= ? AND criado_em < ?
+                ) WHERE n = 1
+            )
+            """.format(ordem=_ORDEM_RECENTE),
+            (inicio, fim),
+        ).fetchall()
+    resultado = [dict(r) for r in rows if (r["score_fundamental"] or 0) > score_minimo]
+    return sorted(resultado, key=lambda r: r["score_fundamental"], reverse=True)
+
+
+def comparar_modelos(caminho=None):
+    """Latência, custo e tokens médios por modelo, para comparar os modos rápido e profundo."""
+    with closing(_conectar(caminho)) as conn:
+        rows = conn.execute(
+            """
+            SELECT modelo, COUNT(*) AS execucoes,
+                   AVG(duracao) AS duracao_media, AVG(custo) AS custo_medio,
+                   SUM(custo) AS custo_total, AVG(tokens_entrada) AS entrada_media,
+                   AVG(tokens_saida) AS saida_media, SUM(truncada) AS truncadas
+            FROM analises WHERE modelo IS NOT NULL
+            GROUP BY modelo ORDER BY execucoes DESC
+            """
+        ).fetchall()
+    return [dict(r) for r in rows]
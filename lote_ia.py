@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+ANÁLISE EM LOTE (MESSAGE BATCHES API)
+Monta os prompts de vários tickers, envia tudo num único lote assíncrono
+(metade do preço do modo síncrono), acompanha até o fim e grava no histórico.
+
+Uso: python lote_ia.py AAPL MSFT NVDA --valor 1000 [--profunda] [--local]
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+from datetime import datetime
+from types import SimpleNamespace
+
+import historico
+import orcamento_tokens
+from main import (
+    client,
+    obter_dados_tecnicos,
+    obter_dados_fundamentalistas,
+    montar_requisicao_ia,
+    RESET, BOLD, GREEN, YELLOW, CYAN, RED,
+)
+
+# ================= CONFIGURAÇÃO =================
+LOTE_INTERVALO = int(os.getenv("LOTE_INTERVALO", "60"))  # segundos entre consultas de status
+LOTE_TIMEOUT = int(os.getenv("LOTE_TIMEOUT", str(24 * 3600)))  # janela máxima da API
+
+
+# ================= SUBSTITUTO LOCAL =================
+class ClienteLoteLocal:
+    """Imita `client.messages.batches` processando cada requisição na hora.
+
+    `responder(params)` devolve o texto de cada item (ou a própria mensagem,
+    com `stop_reason` e `usage`); sem ele, usa o cliente real de forma
+    síncrona. Serve para testes e ambientes sem lote.
+    """
+
+    def __init__(self, responder=None):
+        if responder is None and not client:
+            raise RuntimeError("Claude API não configurada: informe um responder ou ANTHROPIC_API_KEY")
+        self._responder = responder or (lambda params: client.messages.create(**params))
+        self._lotes = {}
+        self.messages = SimpleNamespace(batches=SimpleNamespace(
+            create=self._criar, retrieve=self._consultar, results=self._resultados,
+        ))
+
+    def _criar(self, requests):
+        lote_id = f"lote_local_{len(self._lotes) + 1}"
+        itens = []
+        for req in requests:
+            try:
+                mensagem = self._responder(req["params"])
+                if isinstance(mensagem, str):
+                    mensagem = SimpleNamespace(
+                        content=[SimpleNamespace(type="text", text=mensagem)],
+                        model=req["params"]["model"],
+                        stop_reason="end_turn",
+                        usage=None,
+                    )
+                resultado = SimpleNamespace(type="succeeded", message=mensagem)
+            except Exception as e:
+                resultado = SimpleNamespace(type="errored", error=str(e))
+            itens.append(SimpleNamespace(custom_id=req["custom_id"], result=resultado))
+        self._lotes[lote_id] = itens
+        return self._consultar(lote_id)
+
+    def _consultar(self, lote_id):
+        itens = self._lotes[lote_id]
+        ok = sum(1 for i in itens if i.result.type == "succeeded")
+        return SimpleNamespace(
+            id=lote_id,
+            processing_status="ended",
+            request_counts=SimpleNamespace(
+                processing=0, succeeded=ok, errored=len(itens) - ok, canceled=0, expired=0,
+            ),
+        )
+
+    def _resultados(self, lote_id):
+        return iter(self._lotes[lote_id])
+
+
+# ================= LOTE =================
+def _custom_id(indice, ticker):
+    # A API aceita só [a-zA-Z0-9_-]{1,64}; o índice garante unicidade (ex.: BRK.B)
+    return f"{indice}-{re.sub(r'[^A-Za-z0-9_-]', '_', ticker)}"[:64]
+
+
+def montar_lote(tickers, valor, profunda=False):
+    """Coleta dados de cada ticker e monta as requisições do lote.
+
+    Retorna (requisicoes, contexto), onde contexto[custom_id] guarda
+    ticker, dados, fundamentos e o horário da coleta para gravar o
+    histórico depois — o lote pode levar horas para terminar.
+    """
+    requisicoes = []
+    contexto = {}
+    for i, ticker in enumerate(tickers):
+        ticker = ticker.strip().upper()
+        dados = obter_dados_tecnicos(ticker)
+        if not dados:
+            print(f"{YELLOW}⚠️  {ticker} ignorado no lote (sem preço){RESET}")
+            continue
+        fundamentos = obter_dados_fundamentalistas(ticker)
+        custom_id = _custom_id(i, ticker)
+        requisicoes.append({
+            "custom_id": custom_id,
+            "params": montar_requisicao_ia(ticker, dados, fundamentos, valor, profunda),
+        })
+        contexto[custom_id] = {
+            "ticker": ticker,
+            "dados": dados,
+            "fundamentos": fundamentos,
+            "criado_em": datetime.now(),
+        }
+    return requisicoes, contexto
+
+
+def aguardar_lote(cliente, lote_id, intervalo=None, timeout=None):
+    """Consulta o status até `processing_status == "ended"` e retorna o lote final."""
+    intervalo = intervalo or LOTE_INTERVALO
+    limite = time.monotonic() + (timeout or LOTE_TIMEOUT)
+    while True:
+        lote = cliente.messages.batches.retrieve(lote_id)
+        if lote.processing_status == "ended":
+            return lote
+        if time.monotonic() >= limite:
+            raise TimeoutError(f"Lote {lote_id} não terminou dentro do prazo")
+        contagem = lote.request_counts
+        print(f"{CYAN}⏳ Lote {lote_id}: {contagem.processing} em processamento, "
+              f"{contagem.succeeded} prontos{RESET}")
+        time.sleep(intervalo)
+
+
+def coletar_resultados(cliente, lote_id):
+    """Mapeia custom_id → (texto, metricas); (None, None) para itens com erro/expirados."""
+    textos = {}
+    for item in cliente.messages.batches.results(lote_id):
+        if item.result.type == "succeeded":
+            mensagem = item.result.message
+            texto, truncada = orcamento_tokens.marcar_truncada(
+                mensagem.content[0].text, getattr(mensagem, "stop_reason", None)
+            )
+            if truncada:
+                print(f"{YELLOW}⚠️  {item.custom_id}: análise cortada em max_tokens{RESET}")
+            # Sem latência por item: o lote inteiro é assíncrono
+            metricas = orcamento_tokens.metricas_resposta(
+                getattr(mensagem, "model", None), getattr(mensagem, "usage", None),
+                truncada=truncada, lote=True,
+            )
+            textos[item.custom_id] = (texto, metricas)
+        else:
+            print(f"{YELLOW}⚠️  {item.custom_id}: {item.result.type}{RESET}")
+            textos[item.custom_id] = (None, None)
+    return textos
+
+
+def gerar_analises_em_lote(tickers, valor, profunda=False, cliente=None, intervalo=None):
+    """Pipeline completo: monta, envia, aguarda e grava no histórico.
+
+    Retorna ticker → análise; um ticker repetido na lista fica com a última
+    análise bem-sucedida (o histórico recebe uma linha por item do lote).
+    """
+    cliente = cliente or client
+    if not cliente:
+        print(f"{RED}❌ Claude API não configurada{RESET}")
+        return {}
+
+    requisicoes, contexto = montar_lote(tickers, valor, profunda)
+    if not requisicoes:
+        return {}
+
+    lote = cliente.messages.batches.create(requests=requisicoes)
+    print(f"\n{CYAN}📦 Lote {BOLD}{lote.id}{RESET}{CYAN} enviado com {len(requisicoes)} análises{RESET}")
+    aguardar_lote(cliente, lote.id, intervalo)
+
+    analises = {}
+    prontas = gravadas = 0
+    for custom_id, (texto, metricas) in coletar_resultados(cliente, lote.id).items():
+        ctx = contexto.get(custom_id)
+        if not ctx:
+            continue
+        if texto:
+            prontas += 1
+        if texto or ctx["ticker"] not in analises:
+            analises[ctx["ticker"]] = texto
+        try:
+            historico.salvar_analise(ctx["ticker"], ctx["dados"], ctx["fundamentos"], texto, valor,
+                                     criado_em=ctx["criado_em"], metricas=metricas)
+            gravadas += 1
+        except Exception as e:
+            print(f"{YELLOW}⚠️  Histórico não gravado para {ctx['ticker']}: {e}{RESET}")
+
+    print(f"{GREEN}✅ Lote concluído: {prontas}/{len(requisicoes)} análises geradas, "
+          f"{gravadas} linhas gravadas no histórico{RESET}")
+    return analises
+
+
+# ================= MAIN =================
+def main():
+    parser = argparse.ArgumentParser(description="Gera análises do Claude em lote para vários tickers.")
+    parser.add_argument("tickers", nargs="+", help="Tickers (ex: AAPL MSFT NVDA)")
+    parser.add_argument("--valor", type=float, default=1000.0, help="Valor a investir (USD)")
+    parser.add_argument("--profunda", action="store_true", help="Usa o modelo de análise profunda")
+    parser.add_argument("--local", action="store_true", help="Processa localmente, sem a Batches API")
+    args = parser.parse_args()
+
+    # Sem cliente, cada item viraria um erro gravado no histórico
+    if not client:
+        print(f"{RED}❌ Claude API não configurada{RESET}")
+        return 1
+
+    cliente = ClienteLoteLocal() if args.local else None
+    gerar_analises_em_lote(args.tickers, args.valor, args.profunda, cliente)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
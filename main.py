@@ -5,13 +5,24 @@ Versão estável — com NewsAPI integrado para mais notícias.
 """
 
 import os
+import re
+import sys
+import json
 import time
+import argparse
+import contextlib
+import textwrap
 import requests
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 import anthropic
 
+import historico
+import noticias
+import orcamento_tokens
+import texto_analise
+
 # ================= CONFIGURAÇÃO =================
 load_dotenv()
 
@@ -35,6 +46,8 @@ RED = "\033[91m"
 MAGENTA = "\033[95m"
 WHITE = "\033[97m"
 
+_RE_ANSI = re.compile(r"\033\[[0-9;]*m")
+
 
 # ================= FUNÇÕES AUXILIARES =================
 def safe_float(v, default=0.0):
@@ -51,25 +64,46 @@ def safe_int(v, default=0):
         return default
 
 
+def formatar_header(text, color=CYAN):
+    """Cabeçalho bonito (string com quebras de linha)"""
+    return (
+        f"\n{BOLD}{color}{'═'*100}{RESET}\n"
+        f"{BOLD}{color}{text.center(100)}{RESET}\n"
+        f"{BOLD}{color}{'═'*100}{RESET}"
+    )
+
+
+def formatar_section(text, color=BLUE):
+    """Seção bonita (string com quebras de linha)"""
+    return (
+        f"\n{BOLD}{color}┌{'─'*98}┐{RESET}\n"
+        f"{BOLD}{color}│  {text.ljust(96)}│{RESET}\n"
+        f"{BOLD}{color}└{'─'*98}┘{RESET}"
+    )
+
+
+def formatar_box(text, color=GREEN):
+    """Caixa destacada (string com quebras de linha)"""
+    return (
+        f"\n{BOLD}{color}╔{'═'*98}╗{RESET}\n"
+        f"{BOLD}{color}║  {text.ljust(96)}║{RESET}\n"
+        f"{BOLD}{color}╚{'═'*98}╝{RESET}"
+    )
+
+
 def print_header(text, color=CYAN):
     """Imprime cabeçalho bonito"""
-    print(f"\n{BOLD}{color}{'═'*100}{RESET}")
-    print(f"{BOLD}{color}{text.center(100)}{RESET}")
-    print(f"{BOLD}{color}{'═'*100}{RESET}")
+    print(formatar_header(text, color))
 
 
 def print_section(text, color=BLUE):
     """Imprime seção bonita"""
-    print(f"\n{BOLD}{color}┌{'─'*98}┐{RESET}")
-    print(f"{BOLD}{color}│  {text.ljust(96)}│{RESET}")
-    print(f"{BOLD}{color}└{'─'*98}┘{RESET}")
+    print(formatar_section(text, color))
 
 
 def print_box(text, color=GREEN):
     """Imprime caixa destacada"""
-    print(f"\n{BOLD}{color}╔{'═'*98}╗{RESET}")
-    print(f"{BOLD}{color}║  {text.ljust(96)}║{RESET}")
-    print(f"{BOLD}{color}╚{'═'*98}╝{RESET}")
+    print(formatar_box(text, color))
 
 
 def print_separator():
@@ -77,18 +111,15 @@ def print_separator():
     print(f"{BOLD}{CYAN}{'─'*100}{RESET}")
 
 
+def remover_ansi(texto):
+    """Remove códigos de cor ANSI (saída para arquivo/pipe)"""
+    return _RE_ANSI.sub("", texto)
+
+
 def limpar_markdown(texto):
     """Remove formatação markdown do texto"""
-    import re
-    # Remove asteriscos de negrito e itálico
-    texto = re.sub(r'\*\*\*(.+?)\*\*\*', r'\1', texto)  # ***texto***
-    texto = re.sub(r'\*\*(.+?)\*\*', r'\1', texto)      # **texto**
-    texto = re.sub(r'\*(.+?)\*', r'\1', texto)          # *texto*
-    texto = re.sub(r'__(.+?)__', r'\1', texto)          # __texto__
-    texto = re.sub(r'_(.+?)_', r'\1', texto)            # _texto_
-    # Remove hashtags de títulos mas mantém o texto
-    texto = re.sub(r'^#{1,6}\s+', '', texto, flags=re.MULTILINE)
-    return texto
+    texto_limpo, _ = texto_analise.renderizar(texto)
+    return texto_limpo or ""
 
 
 # ================= DADOS TÉCNICOS =================
@@ -290,101 +321,140 @@ def obter_dados_fundamentalistas(ticker):
 
 
 # ================= NOTÍCIAS =================
-def obter_noticias_finnhub(ticker):
-    """Busca últimas notícias via Finnhub."""
+def obter_noticias_finnhub(ticker, desde=None):
+    """Busca notícias via Finnhub publicadas a partir de `desde` (epoch).
+
+    Retorna None se a consulta não foi feita ou falhou ([] = nenhuma notícia nova).
+    """
     if not FINNHUB_KEY:
-        return []
+        return None
     try:
+        desde = desde or (datetime.now() - timedelta(days=7)).timestamp()
         url = "https://finnhub.io/api/v1/company-news"
         to_date = datetime.now().strftime("%Y-%m-%d")
-        from_date = (datetime.now() - timedelta(days=7)).strftime("%Y-%m-%d")
+        from_date = datetime.fromtimestamp(desde).strftime("%Y-%m-%d")
         params = {"symbol": ticker, "from": from_date, "to": to_date, "token": FINNHUB_KEY}
         r = requests.get(url, params=params, timeout=10)
-        noticias = r.json()[:5]  # Últimas 5
-        print(f"{GREEN}✅ Finnhub: {len(noticias)} notícias encontradas{RESET}")
-        return noticias
+        data = r.json()
+        if r.status_code != 200 or not isinstance(data, list):
+            erro = data.get("error") if isinstance(data, dict) else None
+            print(f"{YELLOW}⚠️  Finnhub notícias: {erro or f'HTTP {r.status_code}'}{RESET}")
+            return None
+        # A API filtra por dia; o corte fino por horário é feito aqui
+        itens = []
+        for item in data:
+            if safe_int(item.get("datetime")) < desde or not item.get("headline"):
+                continue
+            itens.append({
+                "headline": item["headline"],
+                "datetime": safe_int(item.get("datetime")),
+                "source": item.get("source") or "Finnhub",
+                "url": item.get("url", ""),
+                "summary": item.get("summary", ""),
+                "origem": "finnhub"
+            })
+        print(f"{GREEN}✅ Finnhub: {len(itens)} notícias novas{RESET}")
+        return itens
     except Exception as e:
         print(f"{YELLOW}⚠️  Finnhub notícias: {e}{RESET}")
-        return []
+        return None
+
 
+def obter_noticias_newsapi(ticker, desde=None):
+    """Busca notícias via NewsAPI publicadas a partir de `desde` (epoch).
 
-def obter_noticias_newsapi(ticker):
-    """Busca notícias via NewsAPI."""
+    Retorna None se a consulta não foi feita ou falhou ([] = nenhuma notícia nova).
+    """
     if not NEWSAPI_KEY:
-        return []
+        return None
     try:
-        # NewsAPI busca por query (nome da empresa ou ticker)
+        desde = desde or (datetime.now() - timedelta(days=7)).timestamp()
+        # Ticker entre aspas e só em título/descrição: menos ruído em tickers curtos
         url = "https://newsapi.org/v2/everything"
         params = {
-            "q": ticker,
+            "q": f'"{ticker}"',
+            "searchIn": "title,description",
             "apiKey": NEWSAPI_KEY,
             "language": "en",
             "sortBy": "publishedAt",
-            "pageSize": 5,
-            "from": (datetime.now() - timedelta(days=7)).strftime("%Y-%m-%d")
+            "pageSize": 20,
+            "from": datetime.fromtimestamp(desde, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
         }
         r = requests.get(url, params=params, timeout=10)
         data = r.json()
         
         if data.get("status") == "ok":
             articles = data.get("articles", [])
-            print(f"{GREEN}✅ NewsAPI: {len(articles)} notícias encontradas{RESET}")
+            print(f"{GREEN}✅ NewsAPI: {len(articles)} notícias novas{RESET}")
             
             # Converter para formato similar ao Finnhub
-            noticias = []
+            itens = []
             for article in articles:
-                noticias.append({
-                    "headline": article.get("title", "N/A"),
-                    "datetime": article.get("publishedAt", "N/A"),
-                    "source": article.get("source", {}).get("name", "NewsAPI"),
-                    "url": article.get("url", "")
+                if not article.get("title") or not article.get("publishedAt"):
+                    continue
+                publicado = datetime.fromisoformat(article["publishedAt"].replace("Z", "+00:00"))
+                itens.append({
+                    "headline": article["title"],
+                    "datetime": int(publicado.timestamp()),
+                    "source": (article.get("source") or {}).get("name") or "NewsAPI",
+                    "url": article.get("url", ""),
+                    "summary": article.get("description") or "",
+                    "origem": "newsapi"
                 })
-            return noticias
+            return itens
         else:
             print(f"{YELLOW}⚠️  NewsAPI: {data.get('message', 'Erro desconhecido')}{RESET}")
-            return []
+            return None
     except Exception as e:
         print(f"{YELLOW}⚠️  NewsAPI notícias: {e}{RESET}")
-        return []
+        return None
 
 
-def obter_noticias(ticker):
-    """Combina notícias de Finnhub + NewsAPI."""
+def obter_noticias(ticker, limite=10):
+    """Busca só o que é novo em Finnhub + NewsAPI, deduplica e devolve as mais relevantes."""
     print(f"\n{CYAN}📰 Buscando notícias de {BOLD}{ticker}{RESET}{CYAN}...{RESET}")
     
-    noticias_finnhub = obter_noticias_finnhub(ticker)
-    noticias_newsapi = obter_noticias_newsapi(ticker)
-    
-    # Combinar e remover duplicatas
-    todas_noticias = noticias_finnhub + noticias_newsapi
-    
-    # Limitar a 10 notícias mais recentes
-    todas_noticias = todas_noticias[:10]
+    try:
+        if noticias.precisa_buscar(ticker):
+            finnhub = obter_noticias_finnhub(ticker, noticias.inicio_busca(ticker, "finnhub"))
+            newsapi = obter_noticias_newsapi(ticker, noticias.inicio_busca(ticker, "newsapi"))
+            # Só avança a marca (e o TTL) de quem respondeu; falha não pode pular notícias
+            fontes_ok = [o for o, r in (("finnhub", finnhub), ("newsapi", newsapi)) if r is not None]
+            if not fontes_ok:
+                print(f"{YELLOW}⚠️  Nenhum provedor de notícias respondeu — nova tentativa na próxima análise{RESET}")
+            novas = (finnhub or []) + (newsapi or [])
+            guardadas = noticias.guardar(ticker, novas, fontes_ok=fontes_ok)
+            print(f"{CYAN}🧹 {len(novas) - len(guardadas)} repetidas/irrelevantes descartadas{RESET}")
+        else:
+            print(f"{CYAN}♻️  Notícias recentes em cache — provedores não consultados{RESET}")
+        todas_noticias = noticias.ranquear(ticker, limite)
+    except Exception as e:
+        print(f"{YELLOW}⚠️  Estoque de notícias indisponível: {e}{RESET}")
+        todas_noticias = []
     
-    print(f"{CYAN}📊 Total: {len(todas_noticias)} notícias coletadas{RESET}")
+    print(f"{CYAN}📊 Total: {len(todas_noticias)} notícias selecionadas{RESET}")
     
     return todas_noticias
 
 
 # ================= ANÁLISE IA =================
-def gerar_analise_ai(ticker, dados, fundamentos, valor):
-    if not client:
-        print(f"{RED}❌ Claude API não configurada{RESET}")
-        return None
+# Bloco fixo de instruções: vai no `system` com cache_control para ser reaproveitado
+INSTRUCOES_IA = """Você é um analista de ações. Com base nos dados enviados, forneça uma análise concisa (máximo {palavras} palavras) com:
+1. Avaliação técnica e fundamentalista
+2. Impacto das notícias recentes no preço e sentimento
+3. Riscos principais
+4. Recomendação (COMPRAR/MANTER/VENDER) justificada
 
-    print(f"\n{CYAN}🤖 Gerando análise com Claude AI...{RESET}")
+Seja objetivo e direto."""
 
-    # Obter notícias
-    noticias = obter_noticias(ticker)
-    if noticias:
-        noticias_texto = "\n".join([
-            f"- {n.get('headline', 'N/A')} ({n.get('datetime', 'N/A')}) [Fonte: {n.get('source', 'N/A')}]" 
-            for n in noticias
-        ])
-    else:
-        noticias_texto = "Nenhuma notícia recente disponível."
 
-    prompt = f"""Analise a ação {ticker} com base nos dados:
+def montar_requisicao_ia(ticker, dados, fundamentos, valor, profunda=False):
+    """Monta os parâmetros de `messages.create` respeitando o orçamento de tokens."""
+    modo, modelo = orcamento_tokens.escolher_modo(profunda)
+    config = orcamento_tokens.MODOS[modo]
+    instrucoes = INSTRUCOES_IA.format(palavras=config["palavras"])
+
+    dados_texto = f"""Analise a ação {ticker} com base nos dados:
 
 COTAÇÃO ATUAL:
 - Preço: ${dados['preco']:.2f}
@@ -404,59 +474,97 @@ FUNDAMENTOS:
 - Crescimento Receita: {safe_float(fundamentos.get('revenue_growth'))}%
 - Score Fundamental: {fundamentos['score_fundamental']}/100
 
-NOTÍCIAS RECENTES:
-{noticias_texto}
-
 INVESTIMENTO:
 - Capital disponível: ${valor:,.2f}
 - Ações possíveis: {valor/dados['preco']:.2f}
 
-Forneça uma análise concisa (máximo 300 palavras) com:
-1. Avaliação técnica e fundamentalista
-2. Impacto das notícias recentes no preço e sentimento
-3. Riscos principais
-4. Recomendação (COMPRAR/MANTER/VENDER) justificada
+NOTÍCIAS RECENTES:
+"""
 
-Seja objetivo e direto."""
+    # Notícias já vêm ranqueadas; o que não couber no orçamento sai pelo fim da lista
+    manchetes = obter_noticias(ticker, config["noticias"])
+    orcamento = (
+        orcamento_tokens.ORCAMENTO_PROMPT
+        - orcamento_tokens.estimar_tokens(instrucoes)
+        - orcamento_tokens.estimar_tokens(dados_texto)
+    )
+    linhas = orcamento_tokens.aparar_linhas([
+        f"- {n['headline']} ({datetime.fromtimestamp(n['datetime']).strftime('%d/%m %H:%M')}) [{n.get('source', 'N/A')}]"
+        for n in manchetes
+    ], orcamento)
+    noticias_texto = "\n".join(linhas) if linhas else "Nenhuma notícia recente disponível."
+
+    return {
+        "model": modelo,
+        "max_tokens": orcamento_tokens.max_tokens_para(config["palavras"]),
+        "system": [{"type": "text", "text": instrucoes, "cache_control": {"type": "ephemeral"}}],
+        "messages": [{"role": "user", "content": dados_texto + noticias_texto}],
+    }
+
+
+def gerar_analise_ai(ticker, dados, fundamentos, valor, profunda=False):
+    """Retorna (texto, metricas); metricas traz modelo, duração, tokens e custo estimado."""
+    if not client:
+        print(f"{RED}❌ Claude API não configurada{RESET}")
+        return None, None
+
+    print(f"\n{CYAN}🤖 Gerando análise com Claude AI...{RESET}")
+
+    requisicao = montar_requisicao_ia(ticker, dados, fundamentos, valor, profunda)
 
     try:
-        resposta = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=4000,
-            messages=[{"role": "user", "content": prompt}]
+        inicio = time.perf_counter()
+        resposta = client.messages.create(**requisicao)
+        duracao = time.perf_counter() - inicio
+        uso = getattr(resposta, "usage", None)
+        texto, truncada = orcamento_tokens.marcar_truncada(
+            resposta.content[0].text, getattr(resposta, "stop_reason", None)
+        )
+        metricas = orcamento_tokens.metricas_resposta(requisicao["model"], uso, duracao, truncada)
+        custo = metricas["custo"]
+        if truncada:
+            print(f"{YELLOW}⚠️  Análise cortada em max_tokens={requisicao['max_tokens']} — marcada como truncada{RESET}")
+        else:
+            print(f"{GREEN}✅ Análise gerada com sucesso{RESET}")
+        print(
+            f"{CYAN}⏱️  {requisicao['model']}: {duracao:.1f}s"
+            f" · entrada {getattr(uso, 'input_tokens', 0)} tok"
+            f" (cache {getattr(uso, 'cache_read_input_tokens', 0) or 0})"
+            f" · saída {getattr(uso, 'output_tokens', 0)} tok"
+            f"{f' · ~US$ {custo:.4f}' if custo is not None else ''}{RESET}"
         )
-        print(f"{GREEN}✅ Análise gerada com sucesso{RESET}")
-        return resposta.content[0].text
+        return texto, metricas
     except Exception as e:
         print(f"{RED}❌ Erro IA: {e}{RESET}")
-        return None
+        return None, None
 
 
 # ================= EXIBIR RELATÓRIO =================
-def exibir_relatorio(ticker, dados, fundamentos, analise, valor):
-    """Exibe relatório formatado e colorido"""
+def renderizar_relatorio(ticker, dados, fundamentos, analise, valor):
+    """Monta o relatório colorido inteiro numa única string"""
+    linhas = []
     
-    print_header(f"📊 RELATÓRIO DE ANÁLISE — {ticker}", MAGENTA)
-    print(f"{BOLD}📅 Data: {datetime.now().strftime('%d/%m/%Y %H:%M')}{RESET}".center(100))
+    linhas.append(formatar_header(f"📊 RELATÓRIO DE ANÁLISE — {ticker}", MAGENTA))
+    linhas.append(f"{BOLD}📅 Data: {datetime.now().strftime('%d/%m/%Y %H:%M')}{RESET}".center(100))
     
     # SEÇÃO 1: COTAÇÃO
-    print_section("💰 COTAÇÃO ATUAL", CYAN)
-    print(f"\n{'─'*100}")
+    linhas.append(formatar_section("💰 COTAÇÃO ATUAL", CYAN))
+    linhas.append(f"\n{'─'*100}")
     
     var_color = GREEN if dados['variacao'] >= 0 else RED
-    print(f"{BOLD}Ticker:{RESET}               {CYAN}{ticker}{RESET}")
-    print(f"{BOLD}Preço Atual:{RESET}          {CYAN}${dados['preco']:.2f} USD{RESET}")
-    print(f"{BOLD}Variação:{RESET}             {var_color}{dados['variacao']:+.2f}%{RESET}")
-    print(f"{BOLD}Volume:{RESET}               {dados.get('volume', 0):,}")
-    print(f"{BOLD}Abertura:{RESET}             ${dados.get('abertura', 0):.2f}")
-    print(f"{BOLD}Máxima do Dia:{RESET}        ${dados.get('alta', 0):.2f}")
-    print(f"{BOLD}Mínima do Dia:{RESET}        ${dados.get('baixa', 0):.2f}")
-    print(f"{BOLD}Fechamento Anterior:{RESET}  ${dados.get('fechamento_anterior', 0):.2f}")
-    print(f"{BOLD}Fonte:{RESET}                {dados.get('fonte', 'N/A')}")
+    linhas.append(f"{BOLD}Ticker:{RESET}               {CYAN}{ticker}{RESET}")
+    linhas.append(f"{BOLD}Preço Atual:{RESET}          {CYAN}${dados['preco']:.2f} USD{RESET}")
+    linhas.append(f"{BOLD}Variação:{RESET}             {var_color}{dados['variacao']:+.2f}%{RESET}")
+    linhas.append(f"{BOLD}Volume:{RESET}               {dados.get('volume', 0):,}")
+    linhas.append(f"{BOLD}Abertura:{RESET}             ${dados.get('abertura', 0):.2f}")
+    linhas.append(f"{BOLD}Máxima do Dia:{RESET}        ${dados.get('alta', 0):.2f}")
+    linhas.append(f"{BOLD}Mínima do Dia:{RESET}        ${dados.get('baixa', 0):.2f}")
+    linhas.append(f"{BOLD}Fechamento Anterior:{RESET}  ${dados.get('fechamento_anterior', 0):.2f}")
+    linhas.append(f"{BOLD}Fonte:{RESET}                {dados.get('fonte', 'N/A')}")
     
     # SEÇÃO 2: INDICADORES TÉCNICOS
-    print_section("📈 INDICADORES TÉCNICOS", BLUE)
-    print(f"\n{'─'*100}")
+    linhas.append(formatar_section("📈 INDICADORES TÉCNICOS", BLUE))
+    linhas.append(f"\n{'─'*100}")
     
     # RSI
     rsi = dados.get('rsi', 50)
@@ -470,7 +578,7 @@ def exibir_relatorio(ticker, dados, fundamentos, analise, valor):
         rsi_status = f"{YELLOW}Neutro{RESET}"
         rsi_color = YELLOW
     
-    print(f"{BOLD}RSI (14):{RESET}             {rsi_color}{rsi:.2f}{RESET} — {rsi_status}")
+    linhas.append(f"{BOLD}RSI (14):{RESET}             {rsi_color}{rsi:.2f}{RESET} — {rsi_status}")
     
     # Médias Móveis
     sma20 = dados.get('sma_20', 0)
@@ -484,9 +592,9 @@ def exibir_relatorio(ticker, dados, fundamentos, analise, valor):
     else:
         tendencia = f"{YELLOW}Tendência Indefinida{RESET}"
     
-    print(f"{BOLD}SMA 20:{RESET}               ${sma20:.2f}")
-    print(f"{BOLD}SMA 50:{RESET}               ${sma50:.2f}")
-    print(f"{BOLD}Tendência:{RESET}            {tendencia}")
+    linhas.append(f"{BOLD}SMA 20:{RESET}               ${sma20:.2f}")
+    linhas.append(f"{BOLD}SMA 50:{RESET}               ${sma50:.2f}")
+    linhas.append(f"{BOLD}Tendência:{RESET}            {tendencia}")
     
     # Range 52 semanas
     minimo = dados.get('minimo_52w', 0)
@@ -494,18 +602,18 @@ def exibir_relatorio(ticker, dados, fundamentos, analise, valor):
     if maximo > minimo:
         posicao_52w = ((preco - minimo) / (maximo - minimo)) * 100
         pos_color = GREEN if posicao_52w > 50 else RED
-        print(f"{BOLD}52W Range:{RESET}           ${minimo:.2f} - ${maximo:.2f}")
-        print(f"{BOLD}Posição no Range:{RESET}    {pos_color}{posicao_52w:.1f}%{RESET}")
+        linhas.append(f"{BOLD}52W Range:{RESET}           ${minimo:.2f} - ${maximo:.2f}")
+        linhas.append(f"{BOLD}Posição no Range:{RESET}    {pos_color}{posicao_52w:.1f}%{RESET}")
     
     # SEÇÃO 3: FUNDAMENTOS
-    print_section("📊 ANÁLISE FUNDAMENTALISTA", MAGENTA)
-    print(f"\n{'─'*100}")
+    linhas.append(formatar_section("📊 ANÁLISE FUNDAMENTALISTA", MAGENTA))
+    linhas.append(f"\n{'─'*100}")
     
     score = fundamentos['score_fundamental']
     cor = fundamentos['cor_avaliacao']
     
-    print(f"{BOLD}Score Fundamentalista:{RESET}  {cor}{score}/100{RESET} — {cor}{fundamentos['avaliacao'].upper()}{RESET}")
-    print(f"\n{BOLD}Métricas:{RESET}")
+    linhas.append(f"{BOLD}Score Fundamentalista:{RESET}  {cor}{score}/100{RESET} — {cor}{fundamentos['avaliacao'].upper()}{RESET}")
+    linhas.append(f"\n{BOLD}Métricas:{RESET}")
     
     pe = safe_float(fundamentos.get('pe_ratio'))
     pb = safe_float(fundamentos.get('pb_ratio'))
@@ -516,86 +624,187 @@ def exibir_relatorio(ticker, dados, fundamentos, analise, valor):
     debt = safe_float(fundamentos.get('debt_to_equity'))
     
     # Tabela de fundamentos
-    print(f"{'─'*100}")
-    print(f"{'MÉTRICA':<30} {'VALOR':<20} {'AVALIAÇÃO':<40}")
-    print(f"{'─'*100}")
+    linhas.append(f"{'─'*100}")
+    linhas.append(f"{'MÉTRICA':<30} {'VALOR':<20} {'AVALIAÇÃO':<40}")
+    linhas.append(f"{'─'*100}")
     
     # P/L
     if pe > 0:
         pe_aval = f"{GREEN}Barato{RESET}" if pe < 15 else (f"{RED}Caro{RESET}" if pe > 30 else f"{YELLOW}Neutro{RESET}")
-        print(f"{'P/L (Price/Earnings)':<30} {pe:<20.2f} {pe_aval}")
+        linhas.append(f"{'P/L (Price/Earnings)':<30} {pe:<20.2f} {pe_aval}")
     
     # ROE
     if roe != 0:
         roe_aval = f"{GREEN}Excelente{RESET}" if roe > 15 else (f"{YELLOW}Bom{RESET}" if roe > 10 else f"{RED}Fraco{RESET}")
-        print(f"{'ROE (Return on Equity)':<30} {roe:<20.2f}% {roe_aval}")
+        linhas.append(f"{'ROE (Return on Equity)':<30} {roe:<20.2f}% {roe_aval}")
     
     # ROA
     if roa != 0:
-        print(f"{'ROA (Return on Assets)':<30} {roa:<20.2f}%")
+        linhas.append(f"{'ROA (Return on Assets)':<30} {roa:<20.2f}%")
     
     # Margem
     if margin != 0:
         margin_aval = f"{GREEN}Alta{RESET}" if margin > 15 else (f"{YELLOW}Média{RESET}" if margin > 5 else f"{RED}Baixa{RESET}")
-        print(f"{'Margem Líquida':<30} {margin:<20.2f}% {margin_aval}")
+        linhas.append(f"{'Margem Líquida':<30} {margin:<20.2f}% {margin_aval}")
     
     # Crescimento
     if growth != 0:
         growth_aval = f"{GREEN}Crescendo{RESET}" if growth > 0.05 else (f"{YELLOW}Estável{RESET}" if growth > 0 else f"{RED}Declinando{RESET}")
-        print(f"{'Crescimento de Receita':<30} {growth:<20.2f}% {growth_aval}")
+        linhas.append(f"{'Crescimento de Receita':<30} {growth:<20.2f}% {growth_aval}")
     
     # Dívida
     if debt != 0:
         debt_aval = f"{GREEN}Baixo{RESET}" if debt < 1 else (f"{YELLOW}Médio{RESET}" if debt < 2 else f"{RED}Alto{RESET}")
-        print(f"{'Dívida/Patrimônio':<30} {debt:<20.2f} {debt_aval}")
+        linhas.append(f"{'Dívida/Patrimônio':<30} {debt:<20.2f} {debt_aval}")
     
-    print(f"{'─'*100}")
-    print(f"\n{BOLD}Fonte:{RESET} {fundamentos.get('fonte_fundamental', 'N/A')}")
+    linhas.append(f"{'─'*100}")
+    linhas.append(f"\n{BOLD}Fonte:{RESET} {fundamentos.get('fonte_fundamental', 'N/A')}")
     
     # SEÇÃO 4: INVESTIMENTO
-    print_section("💵 SIMULAÇÃO DE INVESTIMENTO", GREEN)
-    print(f"\n{'─'*100}")
+    linhas.append(formatar_section("💵 SIMULAÇÃO DE INVESTIMENTO", GREEN))
+    linhas.append(f"\n{'─'*100}")
     
     acoes = valor / preco
-    print(f"{BOLD}Capital Disponível:{RESET}    {CYAN}${valor:,.2f} USD{RESET}")
-    print(f"{BOLD}Preço por Ação:{RESET}        {CYAN}${preco:.2f}{RESET}")
-    print(f"{BOLD}Quantidade de Ações:{RESET}   {CYAN}{acoes:.4f}{RESET} (~{int(acoes)} ações inteiras)")
-    print(f"{BOLD}Valor Total:{RESET}           {CYAN}${acoes * preco:,.2f}{RESET}")
+    linhas.append(f"{BOLD}Capital Disponível:{RESET}    {CYAN}${valor:,.2f} USD{RESET}")
+    linhas.append(f"{BOLD}Preço por Ação:{RESET}        {CYAN}${preco:.2f}{RESET}")
+    linhas.append(f"{BOLD}Quantidade de Ações:{RESET}   {CYAN}{acoes:.4f}{RESET} (~{int(acoes)} ações inteiras)")
+    linhas.append(f"{BOLD}Valor Total:{RESET}           {CYAN}${acoes * preco:,.2f}{RESET}")
     
     # SEÇÃO 5: ANÁLISE IA
     if analise:
-        print_box("🤖 ANÁLISE INTELIGENTE (CLAUDE AI)", YELLOW)
-        print()
+        linhas.append(formatar_box("🤖 ANÁLISE INTELIGENTE (CLAUDE AI)", YELLOW))
+        linhas.append("")
         
         # Limpar formatação markdown
         analise_limpa = limpar_markdown(analise)
         
-        # Quebrar análise em linhas
-        linhas = analise_limpa.split('\n')
-        for linha in linhas:
-            if len(linha) <= 95:
-                print(f"  {linha}")
-            else:
-                # Quebrar linhas longas
-                palavras = linha.split()
-                linha_atual = ""
-                for palavra in palavras:
-                    if len(linha_atual) + len(palavra) + 1 <= 95:
-                        linha_atual += palavra + " "
-                    else:
-                        print(f"  {linha_atual.strip()}")
-                        linha_atual = palavra + " "
-                if linha_atual:
-                    print(f"  {linha_atual.strip()}")
+        # Quebrar análise em linhas de até 95 colunas
+        for linha in analise_limpa.split('\n'):
+            partes = [linha] if len(linha) <= 95 else textwrap.wrap(linha, width=95)
+            linhas.extend(f"  {parte}" for parte in partes)
     
     # RODAPÉ
-    print(f"\n{BOLD}{CYAN}{'═'*100}{RESET}")
-    print(f"{BOLD}{GREEN}✅ Análise concluída com sucesso!{RESET}".center(110))
-    print(f"{BOLD}{CYAN}{'═'*100}{RESET}\n")
+    linhas.append(f"\n{BOLD}{CYAN}{'═'*100}{RESET}")
+    linhas.append(f"{BOLD}{GREEN}✅ Análise concluída com sucesso!{RESET}".center(110))
+    linhas.append(f"{BOLD}{CYAN}{'═'*100}{RESET}\n")
+    return "\n".join(linhas) + "\n"
+
+
+def exibir_relatorio(ticker, dados, fundamentos, analise, valor, cores=True, saida=None):
+    """Exibe relatório formatado (colorido ou não) com uma única escrita"""
+    texto = renderizar_relatorio(ticker, dados, fundamentos, analise, valor)
+    if not cores:
+        texto = remover_ansi(texto)
+    saida = saida or sys.stdout
+    saida.write(texto)
+    saida.flush()
+
+
+# ================= PIPELINE =================
+def analisar_ticker(ticker, valor, profunda=False):
+    """Dados técnicos + fundamentos + Claude, gravando no histórico. None se não houver preço."""
+    dados = obter_dados_tecnicos(ticker)
+    if not dados:
+        return None
+    
+    fundamentos = obter_dados_fundamentalistas(ticker)
+    
+    analise, metricas = gerar_analise_ai(ticker, dados, fundamentos, valor, profunda)
+    
+    # Guardar execução no histórico local
+    try:
+        historico.salvar_analise(ticker, dados, fundamentos, analise, valor, metricas=metricas)
+    except Exception as e:
+        print(f"{YELLOW}⚠️  Histórico não gravado: {e}{RESET}")
+
+    return dados, fundamentos, analise
+
+
+def relatorio_json(ticker, dados, fundamentos, analise, valor):
+    """Relatório em dicionário serializável (sem códigos ANSI)"""
+    return {
+        "ticker": ticker,
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "valor": valor,
+        "acoes": valor / dados["preco"],
+        "dados": dados,
+        "fundamentos": {k: v for k, v in fundamentos.items() if k != "cor_avaliacao"},
+        "analise": analise,
+        "analise_texto": limpar_markdown(analise) if analise else None,
+    }
+
+
+_COLUNAS_TABELA = f"{'TICKER':<8} {'PREÇO':>10} {'VAR%':>8} {'RSI':>6} {'SCORE':>6}  AVALIAÇÃO"
+
+
+def linha_tabela(ticker, dados, fundamentos):
+    """Uma linha de resumo por ticker para `--format table` (sem ANSI)."""
+    return (
+        f"{ticker:<8} {dados.get('preco', 0):>10.2f} {dados.get('variacao', 0):>+8.2f} "
+        f"{dados.get('rsi', 50):>6.1f} {fundamentos.get('score_fundamental', 0):>6}  "
+        f"{fundamentos.get('avaliacao', 'N/A')}"
+    )
+
+
+def executar_cli(tickers, valor, formato, profunda=False):
+    """Roda o pipeline para vários tickers num só processo.
+
+    Mensagens de progresso vão para stderr; stdout recebe só os relatórios
+    (uma linha NDJSON ou de tabela por ticker, ou o relatório completo em
+    text/ansi), prontos para pipe.
+    """
+    falhas = 0
+    if formato == "table":
+        sys.stdout.write(_COLUNAS_TABELA + "\n")
+    for ticker in tickers:
+        with contextlib.redirect_stdout(sys.stderr):
+            resultado = analisar_ticker(ticker, valor, profunda)
+
+        if resultado is None:
+            falhas += 1
+            if formato == "json":
+                sys.stdout.write(json.dumps({"ticker": ticker, "erro": "sem dados de preço"}, ensure_ascii=False) + "\n")
+                sys.stdout.flush()
+            else:
+                sys.stderr.write(f"{RED}❌ {ticker}: sem dados de preço{RESET}\n")
+            continue
+
+        dados, fundamentos, analise = resultado
+        if formato == "json":
+            linha = json.dumps(relatorio_json(ticker, dados, fundamentos, analise, valor),
+                               ensure_ascii=False, default=str)
+            sys.stdout.write(linha + "\n")
+            sys.stdout.flush()
+        elif formato == "table":
+            sys.stdout.write(linha_tabela(ticker, dados, fundamentos) + "\n")
+            sys.stdout.flush()
+        else:
+            exibir_relatorio(ticker, dados, fundamentos, analise, valor, cores=(formato == "ansi"))
+    return 1 if falhas else 0
 
 
 # ================= MAIN =================
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Analisador de ações. Sem --tickers, roda no modo interativo."
+    )
+    parser.add_argument("--tickers", help="Lista separada por vírgula (ex: AAPL,MSFT,NVDA)")
+    parser.add_argument("--valor", type=float, default=1000.0, help="Valor a investir (USD)")
+    parser.add_argument(
+        "--format", dest="formato", choices=["json", "table", "text", "ansi"],
+        help="json = NDJSON (um objeto por linha); table = uma linha de resumo por ticker; "
+             "text = relatório completo sem cores; padrão: ansi no terminal, text em pipe",
+    )
+    parser.add_argument("--profunda", action="store_true", help="Usa o modelo de análise profunda")
+    args = parser.parse_args(argv)
+
+    if args.tickers:
+        tickers = [t.strip().upper() for t in args.tickers.split(",") if t.strip()]
+        if not tickers or args.valor <= 0:
+            parser.error("informe ao menos um ticker e um valor maior que zero")
+        formato = args.formato or ("ansi" if sys.stdout.isatty() else "text")
+        return executar_cli(tickers, args.valor, formato, args.profunda)
+
     print_header("📊 ANALISADOR DE AÇÕES", CYAN)
     print(f"{BOLD}{WHITE}FINNHUB + ALPHA VANTAGE + TRADIER + FMP + NEWSAPI + CLAUDE AI{RESET}".center(110))
     
@@ -622,18 +831,16 @@ def main():
         print(f"{RED}❌ Valor inválido{RESET}")
         return
 
+    profunda = input(f"{BOLD}{CYAN}🧠 Análise profunda? (s/N):{RESET} ").strip().lower() in ("s", "sim")
+
     # Buscar dados
-    dados = obter_dados_tecnicos(ticker)
-    if not dados:
+    resultado = analisar_ticker(ticker, valor, profunda)
+    if not resultado:
         return
     
-    fundamentos = obter_dados_fundamentalistas(ticker)
-    
-    analise = gerar_analise_ai(ticker, dados, fundamentos, valor)
-    
     # Exibir relatório formatado
-    exibir_relatorio(ticker, dados, fundamentos, analise, valor)
+    exibir_relatorio(ticker, *resultado, valor)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+NOTÍCIAS — DEDUPLICAÇÃO, RELEVÂNCIA E BUSCA INCREMENTAL
+Mantém um estoque limitado por ticker (SQLite) com as manchetes já vistas,
+para buscar nos provedores só o que é novo e mandar ao Claude só o que importa.
+"""
+
+import os
+import re
+import math
+import time
+import hashlib
+import sqlite3
+import unicodedata
+from contextlib import closing
+
+import historico
+
+# ================= CONFIGURAÇÃO =================
+NOTICIAS_DB = os.getenv("NOTICIAS_DB", historico.HISTORICO_DB)
+MAX_NOTICIAS_POR_TICKER = int(os.getenv("MAX_NOTICIAS_POR_TICKER", "50"))
+NOTICIAS_TTL = int(os.getenv("NOTICIAS_TTL", "900"))  # segundos entre buscas nos provedores
+JANELA_INICIAL = 7 * 24 * 3600  # primeira busca de um ticker: últimos 7 dias
+SOBREPOSICAO = 3600  # rebusca 1h antes da marca: atraso de indexação; repetidas caem na deduplicação
+MEIA_VIDA_HORAS = 24.0
+LIMIAR_SIMILARIDADE = 0.8
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS noticias (
+    ticker TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    datetime INTEGER NOT NULL,
+    headline TEXT NOT NULL,
+    source TEXT,
+    url TEXT,
+    summary TEXT,
+    relevancia REAL NOT NULL,
+    PRIMARY KEY (ticker, hash)
+);
+CREATE INDEX IF NOT EXISTS idx_noticias_ticker_data ON noticias (ticker, datetime);
+CREATE TABLE IF NOT EXISTS noticias_estado (
+    ticker TEXT PRIMARY KEY,
+    ultima_busca INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS noticias_marcas (
+    ticker TEXT NOT NULL,
+    origem TEXT NOT NULL,
+    ultimo_datetime INTEGER NOT NULL,
+    PRIMARY KEY (ticker, origem)
+);
+"""
+
+_STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "to", "in", "on", "for", "at", "by",
+    "with", "from", "as", "is", "are", "its", "it", "says", "after", "new",
+}
+_RE_NAO_PALAVRA = re.compile(r"[^a-z0-9 ]+")
+_RE_SUFIXO_FONTE = re.compile(r"\s+[-|–—]\s+([^-|–—]+)$")
+
+_inicializado = set()
+
+
+# ================= FUNÇÕES AUXILIARES =================
+def _conectar(caminho=None):
+    caminho = caminho or NOTICIAS_DB
+    conn = sqlite3.connect(caminho, timeout=10)
+    conn.row_factory = sqlite3.Row
+    if caminho not in _inicializado:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        _inicializado.add(caminho)
+    return conn
+
+
+# ================= NORMALIZAÇÃO =================
+def _sem_sufixo_fonte(headline, source):
+    """Tira o " - Fonte" final (convenção da NewsAPI) só quando é mesmo o nome da fonte."""
+    m = _RE_SUFIXO_FONTE.search(headline)
+    if m and source and m.group(1).strip().casefold() == source.strip().casefold():
+        return headline[:m.start()]
+    return headline
+
+
+def tokens_manchete(headline, source=None):
+    """Conjunto de palavras significativas da manchete (sem acento, pontuação ou sufixo de fonte)."""
+    texto = _sem_sufixo_fonte(headline or "", source)
+    texto = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode("ascii")
+    texto = _RE_NAO_PALAVRA.sub(" ", texto.lower())
+    return frozenset(p for p in texto.split() if p not in _STOPWORDS)
+
+
+def hash_manchete(headline, source=None):
+    """Hash estável da manchete normalizada — mesma notícia em fontes diferentes colide."""
+    chave = " ".join(sorted(tokens_manchete(headline, source)))
+    return hashlib.sha1(chave.encode("utf-8")).hexdigest()
+
+
+def _similaridade(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def relevancia(ticker, noticia):
+    """0–1: quão claramente a notícia fala do ticker.
+
+    Finnhub já filtra por símbolo; para NewsAPI (busca textual) exigimos o
+    ticker como palavra inteira em maiúsculas ou com cifrão, o que descarta
+    falsos positivos de tickers curtos (ex.: "IT", "ON", "F").
+    """
+    ticker = ticker.upper()
+    padrao = re.compile(rf"(?<![A-Za-z0-9])\$?{re.escape(ticker)}(?![A-Za-z0-9])")
+    titulo = noticia.get("headline") or ""
+    resumo = noticia.get("summary") or ""
+
+    if padrao.search(titulo):
+        return 1.0
+    if padrao.search(resumo):
+        return 0.7
+    if noticia.get("origem") == "finnhub":
+        return 0.5
+    return 0.0
+
+
+def pontuar(noticia, agora=None):
+    """Relevância ponderada por decaimento exponencial da idade (meia-vida de 24h)."""
+    agora = agora or time.time()
+    idade_h = max(0.0, (agora - noticia["datetime"]) / 3600.0)
+    return noticia["relevancia"] * math.pow(0.5, idade_h / MEIA_VIDA_HORAS)
+
+
+def deduplicar(noticias, conhecidas=()):
+    """Remove repetidas por hash e quase-idênticas por similaridade de Jaccard.
+
+    `conhecidas` são notícias já guardadas: servem só de referência e não
+    entram no resultado. Entre duplicatas fica a de maior relevância.
+    """
+    vistos = [tokens_manchete(n["headline"], n.get("source")) for n in conhecidas]
+    hashes = {n["hash"] for n in conhecidas}
+    mantidas = []
+    for n in sorted(noticias, key=lambda n: (-n["relevancia"], -n["datetime"])):
+        if n["hash"] in hashes:
+            continue
+        tokens = tokens_manchete(n["headline"], n.get("source"))
+        if any(_similaridade(tokens, t) >= LIMIAR_SIMILARIDADE for t in vistos):
+            continue
+        hashes.add(n["hash"])
+        vistos.append(tokens)
+        mantidas.append(n)
+    return mantidas
+
+
+# ================= ESTOQUE POR TICKER =================
+def ultimo_datetime(ticker, origem, caminho=None):
+    """Timestamp (epoch) do item mais recente já recebido de `origem`, ou None."""
+    with closing(_conectar(caminho)) as conn:
+        row = conn.execute(
+            "SELECT ultimo_datetime FROM noticias_marcas WHERE ticker = ? AND origem = ?",
+            (ticker.upper(), origem),
+        ).fetchone()
+    return row[0] if row else None
+
+
+def precisa_buscar(ticker, agora=None, caminho=None):
+    """True se a última busca nos provedores for mais antiga que NOTICIAS_TTL."""
+    agora = agora or time.time()
+    with closing(_conectar(caminho)) as conn:
+        row = conn.execute(
+            "SELECT ultima_busca FROM noticias_estado WHERE ticker = ?", (ticker.upper(),)
+        ).fetchone()
+    return row is None or agora - row[0] >= NOTICIAS_TTL
+
+
+def inicio_busca(ticker, origem, agora=None, caminho=None):
+    """Epoch a partir do qual `origem` deve ser consultada.
+
+    Cada provedor tem sua própria marca: uma falha ou atraso de um não faz
+    o outro pular notícias.
+    """
+    agora = agora or time.time()
+    ultimo = ultimo_datetime(ticker, origem, caminho)
+    if not ultimo:
+        return int(agora - JANELA_INICIAL)
+    return int(ultimo - SOBREPOSICAO)
+
+
+def guardar(ticker, noticias, agora=None, caminho=None, fontes_ok=()):
+    """Deduplica, insere as novas e poda o estoque do ticker. Retorna as inseridas.
+
+    `fontes_ok` lista as origens que responderam nesta busca: só elas têm a
+    marca avançada, e sem nenhuma o horário da última busca não é gravado,
+    para que a próxima análise tente de novo antes do TTL.
+    """
+    ticker = ticker.upper()
+    agora = int(agora or time.time())
+    for n in noticias:
+        n["hash"] = hash_manchete(n["headline"], n.get("source"))
+        n["relevancia"] = relevancia(ticker, n)
+    candidatas = [n for n in noticias if n["relevancia"] > 0]
+
+    with closing(_conectar(caminho)) as conn, conn:
+        conhecidas = [dict(r) for r in conn.execute(
+            "SELECT hash, headline, source FROM noticias WHERE ticker = ?", (ticker,)
+        )]
+        novas = deduplicar(candidatas, conhecidas)
+        conn.executemany(
+            """
+            INSERT OR IGNORE INTO noticias
+                (ticker, hash, datetime, headline, source, url, summary, relevancia)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (ticker, n["hash"], n["datetime"], n["headline"], n.get("source"),
+                 n.get("url"), n.get("summary"), n["relevancia"])
+                for n in novas
+            ],
+        )
+        conn.execute(
+            """
+            DELETE FROM noticias WHERE ticker = ? AND hash NOT IN (
+                SELECT hash FROM noticias WHERE ticker = ?
+                ORDER BY datetime DESC LIMIT ?
+            )
+            """,
+            (ticker, ticker, MAX_NOTICIAS_POR_TICKER),
+        )
+        for origem in fontes_ok:
+            # Marca pelo que o provedor devolveu, mesmo que caia na deduplicação
+            recebidas = [n["datetime"] for n in noticias if n.get("origem") == origem]
+            if recebidas:
+                conn.execute(
+                    """
+                    INSERT INTO noticias_marcas (ticker, origem, ultimo_datetime) VALUES (?, ?, ?)
+                    ON CONFLICT (ticker, origem) DO UPDATE
+                    SET ultimo_datetime = MAX(ultimo_datetime, excluded.ultimo_datetime)
+                    """,
+                    (ticker, origem, max(recebidas)),
+                )
+        if fontes_ok:
+            conn.execute(
+                "INSERT OR REPLACE INTO noticias_estado (ticker, ultima_busca) VALUES (?, ?)",
+                (ticker, agora),
+            )
+    return novas
+
+
+def ranquear(ticker, limite=10, agora=None, caminho=None):
+    """Notícias guardadas do ticker ordenadas por relevância × recência."""
+    with closing(_conectar(caminho)) as conn:
+        rows = conn.execute(
+            """
+            SELECT datetime, headline, source, url, summary, relevancia
+            FROM noticias WHERE ticker = ?
+            """,
+            (ticker.upper(),),
+        ).fetchall()
+    noticias = [dict(r) for r in rows]
+    noticias.sort(key=lambda n: pontuar(n, agora), reverse=True)
+    return noticias[:limite]
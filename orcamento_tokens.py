@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+ORÇAMENTO DE TOKENS E MODOS DO CLAUDE
+Estima e apara o prompt, dimensiona max_tokens para a resposta pedida e
+escolhe o modelo: rápido (rotina) ou profundo (quando o usuário pede).
+"""
+
+import os
+import math
+
+# ================= CONFIGURAÇÃO =================
+MODO_ESCALONADO = os.getenv("CLAUDE_MODO_ESCALONADO", "1") != "0"
+MODELO_RAPIDO = os.getenv("CLAUDE_MODELO_RAPIDO", "claude-haiku-4-5-20251001")
+MODELO_PROFUNDO = os.getenv("CLAUDE_MODELO_PROFUNDO", "claude-sonnet-4-20250514")
+ORCAMENTO_PROMPT = int(os.getenv("CLAUDE_ORCAMENTO_PROMPT", "1200"))  # tokens de entrada
+
+# Estimativa grosseira para texto misto pt/en; evita uma chamada extra à API de contagem
+CARACTERES_POR_TOKEN = 3.5
+TOKENS_POR_PALAVRA = 1.8
+FOLGA_SAIDA = 1.3
+MAX_CARACTERES_MANCHETE = 160
+AVISO_TRUNCADA = "[Análise interrompida: limite de tokens de saída atingido]"
+
+MODOS = {
+    "rapido": {"palavras": 300, "noticias": 5},
+    "profundo": {"palavras": 600, "noticias": 10},
+}
+
+# USD por milhão de tokens (entrada, saída) — para o custo estimado de cada análise
+PRECOS = {
+    "claude-haiku-4-5-20251001": (1.00, 5.00),
+    "claude-haiku-4-5": (1.00, 5.00),
+    "claude-3-5-haiku-20241022": (0.80, 4.00),  # linhas antigas do histórico
+    "claude-sonnet-4-20250514": (3.00, 15.00),
+}
+
+
+# ================= ORÇAMENTO =================
+def estimar_tokens(texto):
+    return math.ceil(len(texto or "") / CARACTERES_POR_TOKEN)
+
+
+def escolher_modo(profunda=False):
+    """Retorna (nome_do_modo, modelo). Sem escalonamento, tudo vai para o modelo profundo."""
+    if profunda:
+        return "profundo", MODELO_PROFUNDO
+    if not MODO_ESCALONADO:
+        return "rapido", MODELO_PROFUNDO
+    return "rapido", MODELO_RAPIDO
+
+
+def max_tokens_para(palavras):
+    """Teto de saída suficiente para `palavras` palavras, com folga para listas e títulos."""
+    return math.ceil(palavras * TOKENS_POR_PALAVRA * FOLGA_SAIDA)
+
+
+def marcar_truncada(texto, stop_reason):
+    """Retorna (texto, truncada); resposta cortada por max_tokens ganha um aviso no fim."""
+    if stop_reason != "max_tokens":
+        return texto, False
+    return f"{texto.rstrip()}…\n\n{AVISO_TRUNCADA}", True
+
+
+def aparar_linhas(linhas, orcamento):
+    """Mantém as primeiras linhas (já ordenadas por prioridade) que cabem em `orcamento` tokens."""
+    mantidas = []
+    usado = 0
+    for linha in linhas:
+        if len(linha) > MAX_CARACTERES_MANCHETE:
+            linha = linha[:MAX_CARACTERES_MANCHETE - 1].rstrip() + "…"
+        custo = estimar_tokens(linha) + 1
+        if usado + custo > orcamento:
+            break
+        mantidas.append(linha)
+        usado += custo
+    return mantidas
+
+
+def custo_estimado(modelo, uso, lote=False):
+    """Custo em USD a partir do `usage` devolvido pela API (None se o modelo não tiver preço).
+
+    Itens da Message Batches API (`lote=True`) custam metade.
+    """
+    if modelo not in PRECOS or uso is None:
+        return None
+    preco_in, preco_out = PRECOS[modelo]
+    entrada = getattr(uso, "input_tokens", 0) or 0
+    saida = getattr(uso, "output_tokens", 0) or 0
+    cache_escrita = getattr(uso, "cache_creation_input_tokens", 0) or 0
+    cache_leitura = getattr(uso, "cache_read_input_tokens", 0) or 0
+    total = (
+        entrada * preco_in
+        + cache_escrita * preco_in * 1.25
+        + cache_leitura * preco_in * 0.1
+        + saida * preco_out
+    )
+    return total / 1_000_000 * (0.5 if lote else 1.0)
+
+
+def metricas_resposta(modelo, uso, duracao=None, truncada=False, lote=False):
+    """Métricas de uma resposta no formato gravado no histórico."""
+    return {
+        "modelo": modelo,
+        "duracao": duracao,
+        "custo": custo_estimado(modelo, uso, lote),
+        "tokens_entrada": getattr(uso, "input_tokens", None),
+        "tokens_saida": getattr(uso, "output_tokens", None),
+        "truncada": truncada,
+    }
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+PÓS-PROCESSAMENTO DO TEXTO DO CLAUDE
+Converte o markdown da análise em texto puro (terminal) e em HTML seguro
+(web) numa única passada por linha, com padrões pré-compilados.
+"""
+
+import re
+import html
+from functools import lru_cache
+
+# ================= PADRÕES =================
+# Uma alternância só: o primeiro marcador que casar define a ênfase.
+# Sublinhado exige fronteira de palavra, para não quebrar nomes como score_fundamental.
+_RE_ENFASE = re.compile(
+    r"\*\*\*(?=\S)(?P<negrito_italico>.+?)(?<=\S)\*\*\*"
+    r"|\*\*(?=\S)(?P<negrito>.+?)(?<=\S)\*\*"
+    r"|(?<!\w)__(?=\S)(?P<negrito_sub>.+?)(?<=\S)__(?!\w)"
+    r"|\*(?=\S)(?P<italico>.+?)(?<=\S)\*"
+    r"|(?<!\w)_(?=\S)(?P<italico_sub>.+?)(?<=\S)_(?!\w)"
+)
+_RE_TITULO = re.compile(r"^(#{1,6})\s+(.*)$")
+_RE_ITEM = re.compile(r"^\s*[-*•]\s+(.*)$")
+_RE_ITEM_NUMERADO = re.compile(r"^\s*(\d+)[.)]\s+(.*)$")
+
+_TAGS = {
+    "negrito_italico": ("<strong><em>", "</em></strong>"),
+    "negrito": ("<strong>", "</strong>"),
+    "negrito_sub": ("<strong>", "</strong>"),
+    "italico": ("<em>", "</em>"),
+    "italico_sub": ("<em>", "</em>"),
+}
+
+
+# ================= INLINE =================
+def _inline_texto(linha):
+    return _RE_ENFASE.sub(lambda m: _inline_texto(m.group(m.lastgroup)), linha)
+
+
+def _inline_html(linha_escapada):
+    def trocar(m):
+        abre, fecha = _TAGS[m.lastgroup]
+        return abre + _inline_html(m.group(m.lastgroup)) + fecha
+    return _RE_ENFASE.sub(trocar, linha_escapada)
+
+
+# ================= CONVERSÃO =================
+def para_texto(markdown):
+    """Markdown → texto puro: tira ênfases e marcadores de título, mantém o resto."""
+    linhas = []
+    for linha in (markdown or "").split("\n"):
+        titulo = _RE_TITULO.match(linha)
+        if titulo:
+            linha = titulo.group(2)
+        linhas.append(_inline_texto(linha))
+    return "\n".join(linhas)
+
+
+def para_html(markdown):
+    """Markdown → HTML seguro (todo o texto é escapado antes de receber tags)."""
+    partes = []
+    paragrafo = []
+    lista = None  # "ul" ou "ol" enquanto houver itens abertos
+
+    def fechar_paragrafo():
+        if paragrafo:
+            partes.append("<p>" + "<br>".join(paragrafo) + "</p>")
+            paragrafo.clear()
+
+    def fechar_lista():
+        nonlocal lista
+        if lista:
+            partes.append(f"</{lista}>")
+            lista = None
+
+    for linha in (markdown or "").split("\n"):
+        if not linha.strip():
+            fechar_paragrafo()
+            fechar_lista()
+            continue
+
+        titulo = _RE_TITULO.match(linha)
+        item = _RE_ITEM.match(linha)
+        numerado = _RE_ITEM_NUMERADO.match(linha)
+
+        if titulo:
+            fechar_paragrafo()
+            fechar_lista()
+            partes.append(f"<h4>{_inline_html(html.escape(titulo.group(2)))}</h4>")
+        elif item or numerado:
+            fechar_paragrafo()
+            tipo = "ul" if item else "ol"
+            if lista != tipo:
+                fechar_lista()
+                # Seções numeradas costumam vir separadas por parágrafos: a nova
+                # <ol> continua da numeração escrita pelo modelo
+                inicio = int(numerado.group(1)) if numerado else 1
+                partes.append(f'<ol start="{inicio}">' if inicio != 1 else f"<{tipo}>")
+                lista = tipo
+            conteudo = item.group(1) if item else numerado.group(2)
+            partes.append(f"<li>{_inline_html(html.escape(conteudo))}</li>")
+        else:
+            fechar_lista()
+            paragrafo.append(_inline_html(html.escape(linha.strip())))
+
+    fechar_paragrafo()
+    fechar_lista()
+    return "\n".join(partes)
+
+
+@lru_cache(maxsize=512)
+def renderizar(markdown):
+    """(texto, html) da análise; memoizado para que cada texto seja processado uma vez."""
+    if not markdown:
+        return None, None
+    return para_texto(markdown), para_html(markdown)